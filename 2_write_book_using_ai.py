@@ -5,34 +5,80 @@ Script to process markdown files and transform them using AI into book-style tex
 
 import argparse
 import csv
+import hashlib
+import json
 import os
 import random
+import re
 import sys
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 
 # Load environment variables
 load_dotenv()
 
+# Shared session so all API calls reuse TCP/TLS connections instead of
+# paying a fresh handshake per request; retries with backoff cover the
+# transient 429/5xx responses from OpenRouter
+session = requests.Session()
+session.mount('https://', HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=['POST']
+    )
+))
+
+
+# Lightweight row type so filtering doesn't allocate a dict per CSV row
+Note = namedtuple('Note', ['file_name', 'relative_path', 'number_of_chars'])
+
 
 def read_csv_and_filter(input_file, column, value):
     """Read CSV file and filter rows based on column and value."""
     filtered_rows = []
-    
+
     with open(input_file, 'r', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        
+        reader = csv.reader(csvfile)
+        header = next(reader, [])
+
         # Check if column exists
-        if column not in reader.fieldnames:
-            raise ValueError(f"Column '{column}' not found in CSV. Available columns: {reader.fieldnames}")
-        
+        if column not in header:
+            raise ValueError(f"Column '{column}' not found in CSV. Available columns: {header}")
+
+        # Resolve column positions once, then filter by plain indexing
+        col_idx = header.index(column)
+        fn_idx = header.index('file_name')
+        rp_idx = header.index('relative_path')
+        nc_idx = header.index('number_of_chars') if 'number_of_chars' in header else None
+
+        # Rows must reach the columns we index; the optional char count
+        # is padded instead so a short row doesn't drop the note
+        required_len = max(col_idx, fn_idx, rp_idx) + 1
+
         for row in reader:
-            if row.get(column) == value:
-                filtered_rows.append(row)
-    
+            # Hand-redacted CSVs routinely contain blank lines and rows
+            # with missing trailing columns, which DictReader tolerated
+            if len(row) < required_len:
+                continue
+            if row[col_idx] == value:
+                filtered_rows.append(Note(
+                    row[fn_idx],
+                    row[rp_idx],
+                    row[nc_idx] if nc_idx is not None and nc_idx < len(row) else ''
+                ))
+
     return filtered_rows
 
 
@@ -68,7 +114,7 @@ def call_openrouter_api(content, api_key, model, prompt):
     }
     
     try:
-        response = requests.post(url, json=payload, headers=headers, timeout=120)
+        response = session.post(url, json=payload, headers=headers, timeout=120)
         response.raise_for_status()
         
         result = response.json()
@@ -80,13 +126,65 @@ def call_openrouter_api(content, api_key, model, prompt):
         raise
 
 
+# Content-addressed response cache so identical (model, prompt, content)
+# requests are served from disk on reruns instead of hitting the API
+CACHE_DIR = Path('.cache')
+
+
+def get_cache_path(model, prompt, content):
+    """Cache file path for a (model, prompt, content) combination."""
+    key = hashlib.sha256(
+        model.encode() + b'\0' + prompt.encode() + b'\0' + content.encode()
+    ).hexdigest()
+    return CACHE_DIR / key[:2] / key
+
+
+def get_cached_response(model, prompt, content):
+    """Return the cached AI response, or None on a cache miss."""
+    cache_path = get_cache_path(model, prompt, content)
+    if cache_path.exists():
+        try:
+            return cache_path.read_text(encoding='utf-8')
+        except Exception as e:
+            print(f"Warning: Could not read cache file: {e}")
+    return None
+
+
+def store_cached_response(model, prompt, content, ai_response):
+    """Store an AI response in the on-disk cache."""
+    cache_path = get_cache_path(model, prompt, content)
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        cache_path.write_text(ai_response, encoding='utf-8')
+    except Exception as e:
+        print(f"Warning: Could not write cache file: {e}")
+
+
+def get_index_file(output_file):
+    """Path of the sidecar index listing already processed file names."""
+    return Path(f"{output_file}.done")
+
+
 def get_already_processed_files(output_file):
-    """Get list of files that have already been processed in the output file."""
+    """Get list of files that have already been processed in the output file.
+
+    Reads the small sidecar index when present instead of scanning the
+    whole (potentially tens of MB) book output. Older outputs without a
+    sidecar are scanned once and the index is written for next time.
+    """
+    index_file = get_index_file(output_file)
+
+    if index_file.exists():
+        try:
+            return set(index_file.read_text(encoding='utf-8').splitlines())
+        except Exception as e:
+            print(f"Warning: Could not read index file: {e}")
+
     if not Path(output_file).exists():
         return set()
-    
+
     processed_files = set()
-    
+
     try:
         with open(output_file, 'r', encoding='utf-8') as f:
             for line in f:
@@ -97,16 +195,235 @@ def get_already_processed_files(output_file):
     except Exception as e:
         print(f"Warning: Could not read output file: {e}")
         return set()
-    
+
+    # One-shot migration: persist the scan so future runs read the index
+    if processed_files:
+        try:
+            index_file.write_text('\n'.join(processed_files) + '\n', encoding='utf-8')
+        except Exception as e:
+            print(f"Warning: Could not write index file: {e}")
+
     return processed_files
 
 
-def append_to_output_file(output_file, file_name, ai_response):
-    """Append the AI response to the output file."""
-    with open(output_file, 'a', encoding='utf-8') as f:
-        f.write(f"# {file_name}\n\n")
-        f.write(ai_response)
-        f.write("\n\n")
+class RateLimiter:
+    """Token-bucket limiter for request and token budgets per minute.
+
+    Capacity refills continuously with elapsed time, so when the budget
+    allows it acquire() returns immediately instead of sleeping a fixed
+    second between calls.
+    """
+
+    def __init__(self, rpm, tpm=0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.request_capacity = float(rpm)
+        self.token_capacity = float(tpm)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=0):
+        """Block until one request (and the given tokens) fit in the budget."""
+        # A single note can estimate more tokens than the whole per-minute
+        # budget; the bucket never holds more than tpm, so waiting for the
+        # full amount would spin forever. Clamping is safe because the
+        # counts are rough estimates — the oversized call just drains the
+        # entire budget for a minute.
+        if self.tpm and tokens > self.tpm:
+            tokens = self.tpm
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                elapsed = now - self.last_refill
+                self.last_refill = now
+
+                self.request_capacity = min(
+                    float(self.rpm),
+                    self.request_capacity + self.rpm * elapsed / 60
+                )
+                if self.tpm:
+                    self.token_capacity = min(
+                        float(self.tpm),
+                        self.token_capacity + self.tpm * elapsed / 60
+                    )
+
+                if self.request_capacity >= 1 and (not self.tpm or self.token_capacity >= tokens):
+                    self.request_capacity -= 1
+                    if self.tpm:
+                        self.token_capacity -= tokens
+                    return
+
+            time.sleep(0.05)
+
+
+def estimate_tokens(text):
+    """Rough token estimate for rate limiting (~4 chars per token)."""
+    return len(text) // 4
+
+
+# Vaults often contain duplicate templates or boilerplate notes; identical
+# contents (ignoring case and whitespace) share one AI response per run
+_WHITESPACE_RE = re.compile(r'\s+')
+duplicate_lock = threading.Lock()
+duplicate_responses = {}  # normalized content hash -> ai_response
+
+
+def normalized_content_hash(content):
+    """Hash of the content with whitespace and case differences removed."""
+    normalized = _WHITESPACE_RE.sub(' ', content).strip().lower()
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+# Serializes appends to the output file across worker threads
+output_lock = threading.Lock()
+
+
+def append_to_output_file(out, index, file_name, ai_response):
+    """Append the AI response to the already open output and index files.
+
+    The handles stay open for the whole run (opened once in main), so each
+    append costs only the writes, not an open/close cycle per response.
+    """
+    with output_lock:
+        # One writelines call instead of three writes and an f-string;
+        # the pieces go straight into the file's buffer without being
+        # joined into an intermediate string first
+        out.writelines(('# ', file_name, '\n\n', ai_response, '\n\n'))
+        out.flush()
+        # Keep the sidecar index in sync so the next run can skip this
+        # file without rescanning the whole output
+        index.write(f"{file_name}\n")
+        index.flush()
+
+
+def process_file(row, folder, api_key, model, prompt, out, index, limiter):
+    """Read one note, transform it with the AI and append the result.
+
+    Runs on a worker thread; returns a one-line status string for logging.
+    """
+    file_name = row.file_name
+    relative_path = row.relative_path
+
+    content = read_markdown_file(folder, relative_path)
+
+    if not content.strip():
+        return f"{file_name} | Skipping empty file"
+
+    content_hash = normalized_content_hash(content)
+    with duplicate_lock:
+        duplicate = duplicate_responses.get(content_hash)
+    if duplicate is not None:
+        append_to_output_file(out, index, file_name, duplicate)
+        return f"{file_name} ({len(content)} chars) | duplicate content, reused response ✓"
+
+    ai_response = get_cached_response(model, prompt, content)
+    if ai_response is not None:
+        with duplicate_lock:
+            duplicate_responses.setdefault(content_hash, ai_response)
+        append_to_output_file(out, index, file_name, ai_response)
+        return f"{file_name} ({len(content)} chars) | cached ({len(ai_response)} chars) ✓"
+
+    limiter.acquire(tokens=estimate_tokens(prompt + content))
+    ai_response = call_openrouter_api(content, api_key, model, prompt)
+    store_cached_response(model, prompt, content, ai_response)
+    with duplicate_lock:
+        duplicate_responses.setdefault(content_hash, ai_response)
+    append_to_output_file(out, index, file_name, ai_response)
+
+    return f"{file_name} ({len(content)} chars) | done ({len(ai_response)} chars) ✓"
+
+
+def build_batches(rows, batch_chars):
+    """Greedily pack small notes into batches of at most batch_chars.
+
+    Uses the number_of_chars column from the CSV so no file needs to be
+    opened here. Notes bigger than the budget (or with unknown size) get
+    a batch of their own.
+    """
+    batches = []
+    current = []
+    current_chars = 0
+
+    for row in rows:
+        num_chars = int(row.number_of_chars or batch_chars)
+
+        if num_chars >= batch_chars:
+            batches.append([row])
+            continue
+
+        if current and current_chars + num_chars > batch_chars:
+            batches.append(current)
+            current = []
+            current_chars = 0
+
+        current.append(row)
+        current_chars += num_chars
+
+    if current:
+        batches.append(current)
+
+    return batches
+
+
+def parse_batch_response(ai_response):
+    """Parse the JSON object the model returns for a batched request."""
+    text = ai_response.strip()
+
+    # Models often wrap JSON in a markdown code fence despite instructions
+    if text.startswith('```'):
+        text = text.split('\n', 1)[1] if '\n' in text else ''
+        if text.rstrip().endswith('```'):
+            text = text.rstrip()[:-3]
+
+    return json.loads(text)
+
+
+def process_batch(rows, folder, api_key, model, prompt, out, index, limiter):
+    """Transform several small notes with a single AI request.
+
+    The notes are sent together and the model is asked to return a JSON
+    object keyed by filename, so each note still gets its own '# name'
+    block in the output and resume detection keeps working.
+    """
+    if len(rows) == 1:
+        return process_file(rows[0], folder, api_key, model, prompt, out, index, limiter)
+
+    notes = []
+    for row in rows:
+        content = read_markdown_file(folder, row.relative_path)
+        if content.strip():
+            notes.append((row.file_name, content))
+
+    if not notes:
+        return f"batch of {len(rows)} | Skipping, all files empty"
+
+    batch_prompt = (
+        f"{prompt}\n\n"
+        "Apply the instructions above to each NOTE below independently. "
+        "Return only a JSON object mapping each note's filename to its "
+        'transformed text, e.g. {"note.md": "..."}.'
+    )
+    combined = "\n\n".join(
+        f"NOTE {file_name}:\n{content}" for file_name, content in notes
+    )
+
+    ai_response = get_cached_response(model, batch_prompt, combined)
+    if ai_response is None:
+        limiter.acquire(tokens=estimate_tokens(batch_prompt + combined))
+        ai_response = call_openrouter_api(combined, api_key, model, batch_prompt)
+        store_cached_response(model, batch_prompt, combined, ai_response)
+    results = parse_batch_response(ai_response)
+
+    written = 0
+    for file_name, _ in notes:
+        text = results.get(file_name)
+        if text and text.strip():
+            append_to_output_file(out, index, file_name, text)
+            written += 1
+
+    names = ', '.join(file_name for file_name, _ in notes)
+    return f"batch [{names}] | done ({written}/{len(notes)} notes) ✓"
 
 
 def main():
@@ -147,7 +464,37 @@ def main():
         action='store_true',
         help='Randomize the order of notes before processing'
     )
-    
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=4,
+        help='Number of AI requests to keep in flight (default: 4)'
+    )
+    parser.add_argument(
+        '--batch_chars',
+        type=int,
+        default=0,
+        help='Pack notes totalling up to this many characters into one AI request (default: 0, disabled)'
+    )
+    parser.add_argument(
+        '--min_chars',
+        type=int,
+        default=1,
+        help='Skip notes with fewer characters than this, judged from the CSV (default: 1, skips empty files)'
+    )
+    parser.add_argument(
+        '--rpm',
+        type=int,
+        default=60,
+        help='Requests per minute budget for the rate limiter (default: 60)'
+    )
+    parser.add_argument(
+        '--tpm',
+        type=int,
+        default=0,
+        help='Tokens per minute budget for the rate limiter (default: 0, unlimited)'
+    )
+
     args = parser.parse_args()
     
     # Validate prompt is provided
@@ -189,53 +536,70 @@ def main():
     already_processed = get_already_processed_files(args.output_file)
     if already_processed:
         print(f"Found {len(already_processed)} files already processed in output file")
-    
-    # Create output file if it doesn't exist
-    if not Path(args.output_file).exists():
-        Path(args.output_file).write_text('', encoding='utf-8')
-    
+
     print(f"Output will be written to: {args.output_file}")
     
-    # Process each file
-    for idx, row in enumerate(filtered_rows, 1):
-        file_name = row['file_name']
-        relative_path = row['relative_path']
-        t_start = datetime.now().strftime("%H:%M:%S")
-        
-        prefix = f"[{t_start}] [{idx}/{len(filtered_rows)}] {file_name}"
-        
-        # Check if already processed
-        if file_name in already_processed:
-            print(f"{prefix} | Already processed, skipping")
-            continue
-        
-        try:
-            # Read the markdown file
-            content = read_markdown_file(args.folder, relative_path)
-            
-            if not content.strip():
-                print(f"{prefix} | Skipping empty file")
-                continue
-            
-            # Print initial status without newline
-            print(f"{prefix} ({len(content)} chars) | Sending to AI...", end="", flush=True)
-            
-            # Call AI API
-            ai_response = call_openrouter_api(content, api_key, model, args.prompt)
-            
-            # Append to output file
-            append_to_output_file(args.output_file, file_name, ai_response)
-            
-            # Finish the line
-            print(f" done ({len(ai_response)} chars) ✓")
-            
-            # Small delay to avoid rate limiting
-            time.sleep(1)
-            
-        except Exception as e:
-            print(f"\n{prefix} ✗ Error processing {file_name}: {e}")
-            continue
-    
+    # Filter out rows that were already processed in a previous run
+    rows_to_process = [
+        row for row in filtered_rows
+        if row.file_name not in already_processed
+    ]
+    skipped = len(filtered_rows) - len(rows_to_process)
+    if skipped:
+        print(f"Skipping {skipped} already processed files")
+
+    # Drop empty/too-small notes using the char counts already in the CSV,
+    # so they never cost a file open or an API call. Rows without a count
+    # are kept and checked after reading, as before.
+    before = len(rows_to_process)
+    rows_to_process = [
+        row for row in rows_to_process
+        if not row.number_of_chars or int(row.number_of_chars) >= args.min_chars
+    ]
+    too_small = before - len(rows_to_process)
+    if too_small:
+        print(f"Skipping {too_small} files below {args.min_chars} chars")
+
+    # Process files with a bounded pool so several AI requests are in
+    # flight at once; each call still takes tens of seconds server-side,
+    # so overlapping them dominates the total wall time.
+    print(f"Processing with {args.workers} workers")
+
+    # Proactive throttling: calls only wait when the configured budget is
+    # actually exhausted, instead of sleeping a fixed second every time
+    limiter = RateLimiter(args.rpm, args.tpm)
+
+    # Group small notes into shared requests so each one doesn't pay the
+    # full prompt and round-trip cost on its own
+    if args.batch_chars > 0:
+        batches = build_batches(rows_to_process, args.batch_chars)
+        print(f"Packed {len(rows_to_process)} notes into {len(batches)} requests")
+    else:
+        batches = [[row] for row in rows_to_process]
+
+    # Open the output and index files once for the whole run; appends then
+    # avoid an open/close (and its metadata writes) per AI response
+    with open(args.output_file, 'a', encoding='utf-8', buffering=1 << 16) as out, \
+         open(get_index_file(args.output_file), 'a', encoding='utf-8') as index:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            futures = {
+                executor.submit(
+                    process_batch, batch, args.folder,
+                    api_key, model, args.prompt, out, index, limiter
+                ): batch[0].file_name
+                for batch in batches
+            }
+
+            for idx, future in enumerate(as_completed(futures), 1):
+                file_name = futures[future]
+                t_done = datetime.now().strftime("%H:%M:%S")
+                prefix = f"[{t_done}] [{idx}/{len(futures)}]"
+
+                try:
+                    print(f"{prefix} {future.result()}")
+                except Exception as e:
+                    print(f"{prefix} ✗ Error processing {file_name}: {e}")
+
     print(f"\n✓ Processing complete! Output saved to: {args.output_file}")
 
 
@@ -4,17 +4,111 @@ Script to convert markdown file to MP3 audio using ElevenLabs API.
 """
 
 import argparse
+import hashlib
+import json
 import os
+import shutil
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 import re
 
 # Load environment variables
 load_dotenv()
 
+# Shared session so concurrent TTS calls reuse TCP/TLS connections
+# instead of paying a fresh handshake per chunk; the pool is sized to the
+# worker count in main()
+session = requests.Session()
+
+# Sentence boundaries: end punctuation followed by whitespace
+_SENTENCE_BOUNDARY_RE = re.compile(r'[.!?]\s+')
+
+# Markdown header markers at the start of a line (multiline mode)
+_HEADER_MARK_RE = re.compile(r'(?m)^[ \t]*#+[ \t]*')
+
+# Filename cleanup: characters to strip, separators to collapse
+_STRIP_RE = re.compile(r'[^\w\s-]')
+_SPACES_RE = re.compile(r'[-\s]+')
+
+
+class RateLimiter:
+    """Token-bucket limiter on requests per minute.
+
+    Capacity refills continuously with elapsed time, so when the provider
+    budget allows it acquire() returns immediately instead of forcing a
+    fixed sleep between TTS calls.
+    """
+
+    def __init__(self, rpm):
+        self.rpm = rpm
+        self.capacity = float(rpm)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until one request fits in the budget."""
+        if not self.rpm:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.capacity = min(
+                    float(self.rpm),
+                    self.capacity + self.rpm * (now - self.last_refill) / 60
+                )
+                self.last_refill = now
+                if self.capacity >= 1:
+                    self.capacity -= 1
+                    return
+            time.sleep(0.05)
+
+
+# Content-addressed audio cache: identical (provider, voice, model, text)
+# chunks are reused from disk on reruns instead of re-synthesized
+TTS_CACHE_DIR = Path('.cache') / 'tts'
+
+
+def get_tts_cache_path(provider, voice, model, text, extension):
+    """Cache file path for a synthesized chunk."""
+    key = hashlib.sha256(
+        '\0'.join((provider, voice or '', model or '', text)).encode()
+    ).hexdigest()
+    return TTS_CACHE_DIR / key[:2] / f"{key}.{extension}"
+
+
+def fetch_cached_audio(cache_path, output_file):
+    """Copy a cached chunk into place; returns False on a cache miss."""
+    if not cache_path.exists():
+        return False
+    try:
+        shutil.copyfile(cache_path, output_file)
+        return True
+    except OSError as e:
+        print(f"Warning: Could not read audio cache: {e}")
+        return False
+
+
+def store_cached_audio(cache_path, output_file, metadata):
+    """Link a freshly synthesized chunk into the cache with a metadata sidecar."""
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(output_file, cache_path)
+        except OSError:
+            shutil.copyfile(output_file, cache_path)
+        cache_path.with_suffix('.json').write_text(
+            json.dumps(metadata), encoding='utf-8'
+        )
+    except OSError as e:
+        print(f"Warning: Could not write audio cache: {e}")
+
 
 def read_markdown_file(input_file):
     """Read the markdown file content."""
@@ -23,52 +117,58 @@ def read_markdown_file(input_file):
 
 
 def clean_text_for_speech(text):
-    """Clean markdown text for speech synthesis."""
-    # Remove markdown headers (# symbols)
-    lines = []
-    for line in text.split('\n'):
-        # Remove # from headers but keep the text
-        if line.strip().startswith('#'):
-            cleaned_line = line.lstrip('#').strip()
-            if cleaned_line:
-                lines.append(cleaned_line)
-        else:
-            lines.append(line)
-    
-    return '\n'.join(lines)
+    """Clean markdown text for speech synthesis.
+
+    Strips header markers (# symbols) but keeps the header text, in one
+    multiline regex substitution instead of splitting, scanning and
+    re-joining every line in Python.
+    """
+    return _HEADER_MARK_RE.sub('', text)
+
 
+def safe_filename_from_title(title):
+    """Turn a section title into a filesystem-safe name."""
+    name = _STRIP_RE.sub('', title).strip()
+    return _SPACES_RE.sub('_', name)
 
-def split_markdown_by_headers(text):
-    """Split markdown text into sections based on headers."""
+
+def parse_sections(text):
+    """Split markdown into sections and clean them for speech in one pass.
+
+    Replaces the old split-by-headers / clean-text / title-cleanup trio,
+    which each walked the same lines again. Returns a list of
+    (title, safe_title, cleaned_content) tuples; header markers are
+    stripped while the lines are collected, so the content needs no
+    second cleaning pass.
+    """
     sections = []
-    lines = text.split('\n')
     current_title = "preamble"
     current_content = []
-    
-    for line in lines:
+
+    def flush():
+        if current_content:
+            sections.append((
+                current_title,
+                safe_filename_from_title(current_title),
+                '\n'.join(current_content)
+            ))
+
+    for line in text.split('\n'):
         if line.strip().startswith('#'):
             # Save previous section if it has content
-            if current_content:
-                sections.append((current_title, '\n'.join(current_content)))
-            
-            # Start new section
-            # Extract title for filename
+            flush()
+
+            # Start new section; the header text (without #) is kept as
+            # the first content line so it gets spoken
             raw_title = line.lstrip('#').strip()
-            if raw_title:
-                current_title = raw_title
-            else:
-                current_title = "section"
-                
-            # Start content with this line so it gets spoken (clean_text_for_speech handles # removal)
-            current_content = [line]
-            
+            current_title = raw_title if raw_title else "section"
+            current_content = [raw_title] if raw_title else []
         else:
             current_content.append(line)
-            
+
     # Add last section
-    if current_content:
-        sections.append((current_title, '\n'.join(current_content)))
-        
+    flush()
+
     return sections
 
 
@@ -80,55 +180,109 @@ def extract_title_from_markdown(text):
             title = line.lstrip('#').strip()
             if title:
                 # Remove characters that aren't allowed in filenames
-                clean_title = re.sub(r'[^\w\s-]', '', title).strip()
+                clean_title = _STRIP_RE.sub('', title).strip()
                 # Replace spaces with underscores or hyphens
-                clean_title = re.sub(r'[-\s]+', '_', clean_title)
+                clean_title = _SPACES_RE.sub('_', clean_title)
                 return clean_title
     return None
 
 
-def split_text_into_chunks(text, max_chars=5000):
-    """Split text into chunks that respect sentence boundaries."""
+def _utf8_len(text):
+    """Length of text in UTF-8 bytes, for byte-limited providers."""
+    return len(text.encode('utf-8'))
+
+
+def _split_at_sentences(text, max_chars, measure=len):
+    """Greedily slice text at sentence boundaries into pieces <= max_chars.
+
+    One regex pass collects the boundary offsets, then the text is sliced
+    directly — no intermediate copies of the whole string. Sizes are
+    taken with `measure`, so byte-limited providers can pass a UTF-8
+    byte count; each sentence is measured once. A single sentence longer
+    than max_chars is kept whole.
+    """
+    pieces = []
+    start = 0
+    prev_boundary = None
+    last = 0
+    acc = 0  # measured size of text[start:last]
+
+    for match in _SENTENCE_BOUNDARY_RE.finditer(text):
+        boundary = match.end()
+        sentence_size = measure(text[last:boundary])
+        acc += sentence_size
+        last = boundary
+        if acc > max_chars and prev_boundary is not None and prev_boundary > start:
+            pieces.append(text[start:prev_boundary].strip())
+            start = prev_boundary
+            acc = sentence_size
+        prev_boundary = boundary
+
+    acc += measure(text[last:])
+    if acc > max_chars and prev_boundary is not None and prev_boundary > start:
+        pieces.append(text[start:prev_boundary].strip())
+        start = prev_boundary
+
+    tail = text[start:].strip()
+    if tail:
+        pieces.append(tail)
+
+    return pieces
+
+
+def split_text_into_chunks(text, max_chars=5000, measure=len):
+    """Split text into chunks that respect sentence boundaries.
+
+    `measure` sizes the text; the default counts characters, while
+    byte-limited providers (Google's 5000-byte cap) pass `_utf8_len` so
+    ASCII-heavy text fills each request instead of leaving the headroom
+    a character-count guess has to reserve for multi-byte scripts.
+    """
     chunks = []
-    current_chunk = ""
-    
-    # Split by paragraphs first
-    paragraphs = text.split('\n\n')
-    
-    for paragraph in paragraphs:
+    # Accumulate paragraphs in a list and join once per flush; growing a
+    # string with += recopies everything accumulated so far on each append
+    current_parts = []
+    current_len = 0
+
+    def flush():
+        nonlocal current_parts, current_len
+        chunk = '\n\n'.join(current_parts).strip()
+        if chunk:
+            chunks.append(chunk)
+        current_parts = []
+        current_len = 0
+
+    # Split by paragraphs first; each paragraph is measured once
+    for paragraph in text.split('\n\n'):
+        paragraph_size = measure(paragraph)
+
+        # A single paragraph over the limit is split by sentences once,
+        # on its own — accumulated text is never re-scanned
+        if paragraph_size > max_chars:
+            flush()
+            pieces = _split_at_sentences(paragraph, max_chars, measure)
+            chunks.extend(pieces[:-1])
+            if pieces:
+                current_parts = [pieces[-1]]
+                current_len = measure(pieces[-1])
+            continue
+
         # If adding this paragraph would exceed limit, save current chunk
-        if current_chunk and len(current_chunk) + len(paragraph) + 2 > max_chars:
-            chunks.append(current_chunk.strip())
-            current_chunk = paragraph
-        else:
-            if current_chunk:
-                current_chunk += "\n\n" + paragraph
-            else:
-                current_chunk = paragraph
-        
-        # If a single paragraph is too long, split by sentences
-        if len(current_chunk) > max_chars:
-            sentences = current_chunk.replace('. ', '.|').replace('! ', '!|').replace('? ', '?|').split('|')
-            temp_chunk = ""
-            
-            for sentence in sentences:
-                if temp_chunk and len(temp_chunk) + len(sentence) > max_chars:
-                    chunks.append(temp_chunk.strip())
-                    temp_chunk = sentence
-                else:
-                    temp_chunk += sentence
-            
-            current_chunk = temp_chunk
-    
-    if current_chunk.strip():
-        chunks.append(current_chunk.strip())
-    
+        if current_parts and current_len + paragraph_size + 2 > max_chars:
+            flush()
+        current_len += paragraph_size + (2 if current_parts else 0)
+        current_parts.append(paragraph)
+
+    flush()
+
     return chunks
 
 
 def text_to_speech_elevenlabs(text, api_key, voice_id, output_file):
     """Convert text to speech using ElevenLabs API."""
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
+    # The /stream endpoint starts returning audio before synthesis of the
+    # whole chunk finishes
+    url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}/stream"
     
     headers = {
         "Accept": "audio/mpeg",
@@ -148,15 +302,17 @@ def text_to_speech_elevenlabs(text, api_key, voice_id, output_file):
     }
     
     try:
-        response = requests.post(url, json=data, headers=headers, timeout=300)
-        response.raise_for_status()
-        
-        # Save audio to file
-        with open(output_file, 'wb') as f:
-            f.write(response.content)
-        
+        # Stream the response straight to disk so the full audio is never
+        # buffered in memory
+        with session.post(url, json=data, headers=headers, timeout=300, stream=True) as response:
+            response.raise_for_status()
+
+            with open(output_file, 'wb') as f:
+                for block in response.iter_content(chunk_size=65536):
+                    f.write(block)
+
         return True
-        
+
     except requests.exceptions.RequestException as e:
         print(f"Error calling ElevenLabs API: {e}")
         if hasattr(e, 'response') and e.response is not None:
@@ -164,6 +320,63 @@ def text_to_speech_elevenlabs(text, api_key, voice_id, output_file):
         return False
 
 
+def text_to_speech_elevenlabs_ws(text, api_key, voice_id, output_file):
+    """Convert a whole section to speech over the ElevenLabs WebSocket API.
+
+    One stream-input session replaces a POST per chunk: the text is fed
+    in slices over a single connection and the server returns one
+    continuous audio stream, so there are no merge seams and no
+    client-side merge step. Returns False when the optional websockets
+    dependency is missing or the stream fails, so callers can fall back
+    to the chunked POST path.
+    """
+    try:
+        from websockets.sync.client import connect
+    except ImportError:
+        print("Note: websockets not installed; using chunked requests instead.")
+        print("Install with: pip install websockets")
+        return False
+
+    import base64
+
+    url = (
+        f"wss://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
+        "/stream-input?model_id=eleven_multilingual_v2"
+    )
+
+    try:
+        with connect(url) as ws, open(output_file, 'wb') as f:
+            ws.send(json.dumps({
+                "text": " ",
+                "voice_settings": {
+                    "stability": 0.5,
+                    "similarity_boost": 0.75,
+                    "style": 0.0,
+                    "use_speaker_boost": True
+                },
+                "xi_api_key": api_key
+            }))
+
+            # Feed the section in small slices so synthesis starts before
+            # the full text has been sent
+            for start in range(0, len(text), 500):
+                ws.send(json.dumps({"text": text[start:start + 500]}))
+            ws.send(json.dumps({"text": ""}))  # end of input
+
+            while True:
+                message = json.loads(ws.recv())
+                if message.get("audio"):
+                    f.write(base64.b64decode(message["audio"]))
+                if message.get("isFinal"):
+                    break
+
+        return True
+
+    except Exception as e:
+        print(f"Error in ElevenLabs WebSocket stream: {e}")
+        return False
+
+
 def text_to_speech_openai(text, api_key, voice, model, output_file):
     """Convert text to speech using OpenAI API."""
     url = "https://api.openai.com/v1/audio/speech"
@@ -180,15 +393,17 @@ def text_to_speech_openai(text, api_key, voice, model, output_file):
     }
     
     try:
-        response = requests.post(url, json=data, headers=headers, timeout=300)
-        response.raise_for_status()
-        
-        # Save audio to file
-        with open(output_file, 'wb') as f:
-            f.write(response.content)
-        
+        # Stream the response straight to disk so the full audio is never
+        # buffered in memory
+        with session.post(url, json=data, headers=headers, timeout=300, stream=True) as response:
+            response.raise_for_status()
+
+            with open(output_file, 'wb') as f:
+                for block in response.iter_content(chunk_size=65536):
+                    f.write(block)
+
         return True
-        
+
     except requests.exceptions.RequestException as e:
         print(f"Error calling OpenAI API: {e}")
         if hasattr(e, 'response') and e.response is not None:
@@ -196,28 +411,56 @@ def text_to_speech_openai(text, api_key, voice, model, output_file):
         return False
 
 
+# The Google TTS client owns an authenticated gRPC channel that takes
+# several round trips to set up; share one across all chunks instead of
+# rebuilding it per call. The request objects are also cached per
+# (voice, language) since they never change between chunks.
+_google_client = None
+_google_request_cache = {}
+_google_lock = threading.Lock()
+
+
+def _get_google_client():
+    """Return the shared Google TTS client, creating it on first use."""
+    global _google_client
+    with _google_lock:
+        if _google_client is None:
+            from google.cloud import texttospeech
+            _google_client = texttospeech.TextToSpeechClient()
+        return _google_client
+
+
+def _get_google_request_params(voice_name, language_code):
+    """Return cached (voice, audio_config) for a voice/language pair."""
+    key = (voice_name, language_code)
+    with _google_lock:
+        if key not in _google_request_cache:
+            from google.cloud import texttospeech
+            _google_request_cache[key] = (
+                texttospeech.VoiceSelectionParams(
+                    language_code=language_code,
+                    name=voice_name
+                ),
+                texttospeech.AudioConfig(
+                    audio_encoding=texttospeech.AudioEncoding.LINEAR16
+                )
+            )
+        return _google_request_cache[key]
+
+
 def text_to_speech_google(text, voice_name, language_code, output_file):
     """Convert text to speech using Google Cloud TTS API."""
     try:
         from google.cloud import texttospeech
-        
-        # Initialize the client
-        client = texttospeech.TextToSpeechClient()
-        
+
+        # Shared client and cached request params: only the text changes
+        # between chunks
+        client = _get_google_client()
+        voice, audio_config = _get_google_request_params(voice_name, language_code)
+
         # Set the text input to be synthesized
         synthesis_input = texttospeech.SynthesisInput(text=text)
-        
-        # Build the voice request
-        voice = texttospeech.VoiceSelectionParams(
-            language_code=language_code,
-            name=voice_name
-        )
-        
-        # Select the type of audio file you want returned
-        audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.LINEAR16
-        )
-        
+
         # Perform the text-to-speech request
         response = client.synthesize_speech(
             input=synthesis_input, voice=voice, audio_config=audio_config
@@ -238,20 +481,202 @@ def text_to_speech_google(text, voice_name, language_code, output_file):
         return False
 
 
+def text_to_speech_google_long(text, voice_name, language_code, gcs_bucket, output_file):
+    """Synthesize a whole section in one call via Google's long-audio API.
+
+    synthesize_long_audio accepts up to ~1 MB of input, so a section that
+    would otherwise be split into many 4000-char chunks goes out as one
+    request. Google writes the audio to a GCS bucket; the result is
+    downloaded into place and the temporary blob deleted. Returns False
+    on any failure so callers can fall back to the chunked path.
+    """
+    try:
+        from google.cloud import texttospeech
+        from google.cloud import storage
+        import google.auth
+    except ImportError:
+        print("Error: google-cloud-texttospeech / google-cloud-storage not installed.")
+        print("Install with: pip install google-cloud-texttospeech google-cloud-storage")
+        return False
+
+    try:
+        credentials, project = google.auth.default()
+        if not project:
+            print("Error: could not determine Google Cloud project for long-audio synthesis")
+            return False
+
+        client = texttospeech.TextToSpeechLongAudioSynthesizeClient()
+
+        blob_name = f"tts-tmp/{hashlib.sha256(text.encode()).hexdigest()}.wav"
+        request = texttospeech.SynthesizeLongAudioRequest(
+            parent=f"projects/{project}/locations/us-central1",
+            input=texttospeech.SynthesisInput(text=text),
+            voice=texttospeech.VoiceSelectionParams(
+                language_code=language_code,
+                name=voice_name
+            ),
+            audio_config=texttospeech.AudioConfig(
+                audio_encoding=texttospeech.AudioEncoding.LINEAR16
+            ),
+            output_gcs_uri=f"gs://{gcs_bucket}/{blob_name}"
+        )
+
+        operation = client.synthesize_long_audio(request=request)
+        operation.result(timeout=3600)
+
+        blob = storage.Client().bucket(gcs_bucket).blob(blob_name)
+        blob.download_to_filename(output_file)
+        blob.delete()
+
+        return True
+
+    except Exception as e:
+        print(f"Error calling Google long-audio API: {e}")
+        return False
+
+
+def probe_audio_params(audio_file):
+    """Get (sample_rate, channels) of an audio file using ffprobe."""
+    import subprocess
+
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'a:0',
+        '-show_entries', 'stream=sample_rate,channels',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        str(audio_file)
+    ]
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, text=True)
+        sample_rate, channels = result.stdout.split()
+        return int(sample_rate), int(channels)
+    except Exception:
+        return None
+
+
+def merge_audio_files_ffmpeg(audio_files, output_file):
+    """Merge chunk files with ffmpeg's concat demuxer.
+
+    Streams the compressed frames straight through (-c copy) instead of
+    decoding everything to PCM in memory, so the merge is fast and uses
+    constant memory. The 500 ms pause between chunks is a single silence
+    file rendered once and interleaved into the concat list. The temp
+    names carry the output's stem so concurrent merges into the same
+    folder (run_all.py merges from several workers) never share files.
+    """
+    import shutil
+    import subprocess
+
+    if not shutil.which('ffmpeg'):
+        return False
+
+    output_dir = Path(output_file).parent
+    output_base = Path(output_file).stem
+    extension = Path(output_file).suffix.lstrip('.') or 'mp3'
+    silence_file = output_dir / f".{output_base}.silence_500ms.{extension}"
+    list_file = output_dir / f".{output_base}.concat_list.txt"
+
+    try:
+        # Render the spacer with the same sample rate/channels as the
+        # chunks so stream copy produces a coherent file
+        params = probe_audio_params(audio_files[0])
+        have_silence = False
+        if params:
+            sample_rate, channels = params
+            layout = 'mono' if channels == 1 else 'stereo'
+            silence_cmd = [
+                'ffmpeg', '-v', 'error',
+                '-f', 'lavfi',
+                '-i', f'anullsrc=r={sample_rate}:cl={layout}',
+                '-t', '0.5'
+            ]
+            if extension == 'mp3':
+                silence_cmd.extend(['-c:a', 'libmp3lame'])
+            silence_cmd.extend(['-y', str(silence_file)])
+            have_silence = subprocess.run(silence_cmd).returncode == 0
+
+        with open(list_file, 'w', encoding='utf-8') as f:
+            for idx, audio_file in enumerate(audio_files):
+                if idx > 0 and have_silence:
+                    f.write(f"file '{silence_file.name}'\n")
+                safe_path = os.path.basename(audio_file).replace("'", "'\\''")
+                f.write(f"file '{safe_path}'\n")
+
+        cmd = [
+            'ffmpeg', '-v', 'error',
+            '-f', 'concat',
+            '-safe', '0',
+            '-i', str(list_file),
+            '-c', 'copy',
+            '-y', str(output_file)
+        ]
+        return subprocess.run(cmd).returncode == 0
+    except Exception as e:
+        print(f"Warning: ffmpeg merge failed: {e}")
+        return False
+    finally:
+        for temp_file in (list_file, silence_file):
+            try:
+                os.remove(temp_file)
+            except OSError:
+                pass
+
+
 def merge_audio_files(audio_files, output_file):
-    """Merge multiple audio files into one using pydub."""
+    """Merge multiple audio files into one."""
+    print(f"Merging {len(audio_files)} audio files...")
+
+    # A single chunk needs no merge — move it into place
+    if len(audio_files) == 1:
+        if str(audio_files[0]) != str(output_file):
+            shutil.copyfile(audio_files[0], output_file)
+            try:
+                os.remove(audio_files[0])
+            except OSError:
+                pass
+        print(f"✓ Merged audio saved to: {output_file}")
+        return True
+
+    if merge_audio_files_ffmpeg(audio_files, output_file):
+        print(f"✓ Merged audio saved to: {output_file}")
+        for audio_file in audio_files:
+            try:
+                os.remove(audio_file)
+            except:
+                pass
+        return True
+
+    # Fall back to pydub when ffmpeg isn't available
     try:
         from pydub import AudioSegment
-        
-        print(f"Merging {len(audio_files)} audio files...")
-        combined = AudioSegment.empty()
-        
-        for audio_file in audio_files:
+
+        # Concatenate raw PCM in a list and build one AudioSegment at the
+        # end; repeated `combined += audio` copies the whole growing buffer
+        # on every append, which is quadratic in total audio size
+        first = AudioSegment.from_file(audio_files[0])
+        frame_rate = first.frame_rate
+        sample_width = first.sample_width
+        channels = first.channels
+
+        # 500 ms pause between chunks, rendered once as zeroed frames
+        silence_raw = b'\x00' * (int(frame_rate * 0.5) * sample_width * channels)
+
+        raw_parts = [first.raw_data, silence_raw]
+        for audio_file in audio_files[1:]:
             audio = AudioSegment.from_file(audio_file)
-            combined += audio
-            # Add a small pause between chunks (500ms)
-            combined += AudioSegment.silent(duration=500)
-        
+            if (audio.frame_rate, audio.sample_width, audio.channels) != (frame_rate, sample_width, channels):
+                audio = audio.set_frame_rate(frame_rate).set_sample_width(sample_width).set_channels(channels)
+            raw_parts.append(audio.raw_data)
+            raw_parts.append(silence_raw)
+
+        combined = AudioSegment(
+            data=b''.join(raw_parts),
+            sample_width=sample_width,
+            frame_rate=frame_rate,
+            channels=channels
+        )
+
         # Determine format from output file extension
         output_format = "mp3"
         if str(output_file).lower().endswith(".wav"):
@@ -308,7 +733,23 @@ def main():
         '--model',
         help='Model to use for OpenAI (defaults to "tts-1")'
     )
-    
+    parser.add_argument(
+        '--gcs_bucket',
+        help='GCS bucket for Google long-audio synthesis (sends whole sections in one request)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=4,
+        help='Number of TTS requests to keep in flight per section (default: 4)'
+    )
+    parser.add_argument(
+        '--rpm',
+        type=int,
+        default=0,
+        help='Requests per minute budget for the TTS provider (default: 0, unlimited)'
+    )
+
     args = parser.parse_args()
     
     print(f"Using provider: {args.provider}")
@@ -318,6 +759,9 @@ def main():
     if args.provider == 'google':
         file_extension = 'wav'
 
+    # Chunk limits are in characters unless a provider enforces bytes
+    chunk_measure = len
+
     # Get configuration based on provider
     if args.provider == 'elevenlabs':
         api_key = os.getenv('ELEVENLABS_API_KEY')
@@ -339,8 +783,11 @@ def main():
     elif args.provider == 'google':
         voice = args.voice or os.getenv('GOOGLE_VOICE', 'pl-PL-Chirp3-HD-Iapetus')
         language = args.language or os.getenv('GOOGLE_LANGUAGE', 'pl-PL')
-        # Reduced from 5000 to 2500 to stay under the 5000-byte limit for multi-byte characters
-        max_chunk_size = 4000 
+        # Google's limit is 5000 bytes, not characters; measuring chunks
+        # in UTF-8 bytes lets each request use nearly the whole budget
+        # instead of the conservative 4000-char guess used previously
+        max_chunk_size = 4900
+        chunk_measure = _utf8_len
         
         # Check for Google Application Credentials
         if not os.getenv('GOOGLE_APPLICATION_CREDENTIALS'):
@@ -362,7 +809,63 @@ def main():
         
         print(f"Using voice: {voice}")
         print(f"Using model: {model}")
-    
+
+    # Size the connection pool to the worker count so every in-flight
+    # request can keep its own connection alive; transient provider
+    # errors and rate-limit bursts retry with exponential backoff at the
+    # transport layer instead of failing the whole chunk
+    session.mount('https://', HTTPAdapter(
+        pool_connections=args.workers,
+        pool_maxsize=args.workers,
+        max_retries=Retry(
+            total=5,
+            backoff_factor=1,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['POST']
+        )
+    ))
+
+    # Proactive throttling shared by all workers: calls only wait when the
+    # configured budget is exhausted, never a fixed sleep per chunk
+    limiter = RateLimiter(args.rpm)
+
+    # Bind the provider choice once so the chunk loop below can submit a
+    # uniform callable to the worker pool
+    if args.provider == 'elevenlabs':
+        cache_model = 'eleven_multilingual_v2'
+
+        def call_provider(chunk, chunk_output):
+            return text_to_speech_elevenlabs(chunk, api_key, voice, chunk_output)
+    elif args.provider == 'google':
+        cache_model = language
+
+        def call_provider(chunk, chunk_output):
+            return text_to_speech_google(chunk, voice, language, chunk_output)
+    else:  # openai
+        cache_model = model
+
+        def call_provider(chunk, chunk_output):
+            return text_to_speech_openai(chunk, api_key, voice, model, chunk_output)
+
+    def synthesize(chunk, chunk_output):
+        cache_path = get_tts_cache_path(
+            args.provider, voice, cache_model, chunk, file_extension
+        )
+        if fetch_cached_audio(cache_path, chunk_output):
+            return True
+
+        limiter.acquire()
+        if not call_provider(chunk, chunk_output):
+            return False
+
+        store_cached_audio(cache_path, chunk_output, {
+            'provider': args.provider,
+            'voice': voice,
+            'model': cache_model,
+            'chars': len(chunk),
+        })
+        return True
+
     # Set up paths
     input_path = Path(args.input_file)
     if not input_path.exists():
@@ -376,13 +879,24 @@ def main():
     content = read_markdown_file(input_path)
     print(f"File has {len(content)} characters")
     
-    # Split content by headers
-    sections = split_markdown_by_headers(content)
+    # Split content by headers and clean it in the same pass
+    sections = parse_sections(content)
     print(f"Found {len(sections)} sections/chapters")
-    
-    for section_idx, (section_title, section_content) in enumerate(sections):
+
+    # One pool for the whole document: workers and their keep-alive
+    # connections persist across sections instead of being torn down and
+    # re-handshaked at every section boundary
+    executor = ThreadPoolExecutor(max_workers=args.workers)
+
+    # Merges are disk-bound; running them on their own thread lets the
+    # next section's network-bound TTS requests start immediately instead
+    # of waiting for the previous section's files to be stitched together
+    merge_executor = ThreadPoolExecutor(max_workers=1)
+    pending_merges = []
+
+    for section_idx, (section_title, section_safe_title, cleaned_text) in enumerate(sections):
         print(f"\n--- Processing Section {section_idx + 1}/{len(sections)}: {section_title} ---")
-        
+
         # Determine output filename for this section
         if section_title == "preamble":
             # If it's the preamble, use input filename + preamble
@@ -392,11 +906,9 @@ def main():
             else:
                 safe_title = f"{input_path.stem}_preamble"
         else:
-            # Clean title for filename
-            clean_title = re.sub(r'[^\w\s-]', '', section_title).strip()
-            clean_title = re.sub(r'[-\s]+', '_', clean_title)
-            safe_title = clean_title
-            
+            # Title already cleaned for filenames by parse_sections
+            safe_title = section_safe_title
+
         # Remove trailing 'md' if present
         if safe_title.lower().endswith('md'):
             safe_title = safe_title[:-2]
@@ -421,8 +933,6 @@ def main():
             print(f"Skipping {output_file} - already exists")
             continue
     
-        # Clean text for speech
-        cleaned_text = clean_text_for_speech(section_content)
         print(f"Cleaned section text has {len(cleaned_text)} characters")
         
         if not cleaned_text.strip():
@@ -430,48 +940,96 @@ def main():
             continue
         
         # Split into chunks if needed
-        chunks = split_text_into_chunks(cleaned_text, max_chars=max_chunk_size)
+        chunks = split_text_into_chunks(cleaned_text, max_chars=max_chunk_size, measure=chunk_measure)
         print(f"Split into {len(chunks)} chunks")
+
+        # For ElevenLabs, a multi-chunk section can stream over one
+        # WebSocket session instead: no per-chunk requests, no merge
+        if args.provider == 'elevenlabs' and len(chunks) > 1:
+            cache_path = get_tts_cache_path(
+                args.provider, voice, cache_model, cleaned_text, file_extension
+            )
+            if fetch_cached_audio(cache_path, output_file):
+                print(f"\n  ✓ Section audio saved to: {output_file} (cached)")
+                continue
+            limiter.acquire()
+            if text_to_speech_elevenlabs_ws(cleaned_text, api_key, voice, output_file):
+                store_cached_audio(cache_path, output_file, {
+                    'provider': args.provider,
+                    'voice': voice,
+                    'model': cache_model,
+                    'chars': len(cleaned_text),
+                })
+                print(f"\n  ✓ Section audio saved to: {output_file}")
+                continue
+            print("  WebSocket streaming unavailable, falling back to chunked requests")
+
+        # With a GCS bucket configured, Google's long-audio API takes the
+        # whole section in one request and synthesizes it server-side
+        if args.provider == 'google' and args.gcs_bucket and len(chunks) > 1:
+            cache_path = get_tts_cache_path(
+                args.provider, voice, cache_model, cleaned_text, file_extension
+            )
+            if fetch_cached_audio(cache_path, output_file):
+                print(f"\n  ✓ Section audio saved to: {output_file} (cached)")
+                continue
+            limiter.acquire()
+            if text_to_speech_google_long(cleaned_text, voice, language, args.gcs_bucket, output_file):
+                store_cached_audio(cache_path, output_file, {
+                    'provider': args.provider,
+                    'voice': voice,
+                    'model': cache_model,
+                    'chars': len(cleaned_text),
+                })
+                print(f"\n  ✓ Section audio saved to: {output_file}")
+                continue
+            print("  Long-audio synthesis failed, falling back to chunked requests")
         
-        # Convert each chunk to audio
+        # Convert chunks to audio in parallel; synthesis is network-bound,
+        # so several requests in flight collapse the per-chunk latency
         audio_files = []
         output_base = output_file.stem
-        
-        for idx, chunk in enumerate(chunks):
-            print(f"\n  [{idx + 1}/{len(chunks)}] Converting chunk to audio...")
-            print(f"    Chunk size: {len(chunk)} characters")
-            
-            if len(chunks) > 1:
-                chunk_output = output_dir / f"{output_base}_chunk_{idx}.{file_extension}"
-            else:
-                chunk_output = output_file
-            
-            # Call appropriate API based on provider
-            if args.provider == 'elevenlabs':
-                success = text_to_speech_elevenlabs(chunk, api_key, voice, chunk_output)
-            elif args.provider == 'google':
-                success = text_to_speech_google(chunk, voice, language, chunk_output)
-            else:  # openai
-                success = text_to_speech_openai(chunk, api_key, voice, model, chunk_output)
-            
-            if success:
+
+        if len(chunks) > 1:
+            chunk_outputs = [
+                output_dir / f"{output_base}_chunk_{idx}.{file_extension}"
+                for idx in range(len(chunks))
+            ]
+        else:
+            chunk_outputs = [output_file]
+
+        futures = [
+            executor.submit(synthesize, chunk, chunk_output)
+            for chunk, chunk_output in zip(chunks, chunk_outputs)
+        ]
+
+        # Collect in submission order so audio_files stays sorted
+        for idx, (future, chunk_output) in enumerate(zip(futures, chunk_outputs)):
+            if future.result():
                 file_size = os.path.getsize(chunk_output)
-                print(f"    ✓ Audio saved: {chunk_output} ({file_size / 1024:.1f} KB)")
+                print(f"  [{idx + 1}/{len(chunks)}] ✓ Audio saved: {chunk_output} ({file_size / 1024:.1f} KB)")
                 audio_files.append(str(chunk_output))
             else:
-                print(f"    ✗ Failed to convert chunk {idx + 1}")
+                print(f"  [{idx + 1}/{len(chunks)}] ✗ Failed to convert chunk")
+                executor.shutdown(wait=False, cancel_futures=True)
                 sys.exit(1)
-            
-            # Small delay to avoid rate limiting
-            if idx < len(chunks) - 1:
-                time.sleep(1)
-        
-        # Merge chunks if multiple
+
+        # Merge chunks if multiple; the merge overlaps with the next
+        # section's synthesis
         if len(audio_files) > 1:
-            merge_audio_files(audio_files, str(output_file))
+            pending_merges.append(
+                merge_executor.submit(merge_audio_files, audio_files, str(output_file))
+            )
         else:
             print(f"\n  ✓ Section audio saved to: {output_file}")
 
+    executor.shutdown()
+
+    # Wait for any merges still running in the background
+    for merge_future in pending_merges:
+        merge_future.result()
+    merge_executor.shutdown()
+
 
 
 if __name__ == '__main__':
@@ -5,59 +5,176 @@ Requires ffmpeg and ffprobe to be installed.
 """
 
 import argparse
+import atexit
+import json
 import os
+import shutil
 import sys
 import subprocess
 import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
 from pathlib import Path
 from datetime import datetime
 
 def check_dependencies():
     """Check if ffmpeg is available."""
-    try:
-        subprocess.run(['ffmpeg', '-version'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-        subprocess.run(['ffprobe', '-version'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    # A PATH lookup is enough to know the binaries exist; spawning
+    # ffmpeg/ffprobe just for -version costs two fork+execs per run
+    if shutil.which('ffmpeg') and shutil.which('ffprobe'):
         return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        print("Error: ffmpeg or ffprobe not found.")
-        print("Please install ffmpeg:")
-        print("  macOS: brew install ffmpeg")
-        print("  Ubuntu: sudo apt-get install ffmpeg")
-        return False
+    print("Error: ffmpeg or ffprobe not found.")
+    print("Please install ffmpeg:")
+    print("  macOS: brew install ffmpeg")
+    print("  Ubuntu: sudo apt-get install ffmpeg")
+    return False
+
+# Probe results persist across runs keyed by (path, size, mtime): a
+# rerun with a different --bitrate or --cover skips the analyze phase
+# entirely since the inputs are byte-identical
+_DURATION_CACHE_FILE = Path.home() / '.cache' / 'obsidian-to-audiobook' / 'durations.json'
+_duration_cache = None
+_duration_cache_dirty = False
+
+
+def _load_duration_cache():
+    """Load the on-disk duration cache on first use."""
+    global _duration_cache
+    if _duration_cache is None:
+        try:
+            _duration_cache = json.loads(_DURATION_CACHE_FILE.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            _duration_cache = {}
+        atexit.register(_save_duration_cache)
+    return _duration_cache
+
+
+def _save_duration_cache():
+    """Persist the duration cache if any probes were added this run."""
+    if not _duration_cache_dirty:
+        return
+    try:
+        _DURATION_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        _DURATION_CACHE_FILE.write_text(json.dumps(_duration_cache), encoding='utf-8')
+    except OSError:
+        pass
+
 
 def get_audio_duration(file_path):
     """Get duration of audio file in seconds using ffprobe."""
+    global _duration_cache_dirty
+
+    cache = _load_duration_cache()
+    cache_key = None
+    try:
+        stat = os.stat(file_path)
+        cache_key = f"{Path(file_path).resolve()}|{stat.st_size}|{stat.st_mtime_ns}"
+    except OSError:
+        pass
+    if cache_key in cache:
+        return cache[cache_key]
+
+    # Ask for both the container and the stream duration in one probe;
+    # whichever the demuxer filled in from the header is used, so no
+    # second ffprobe run is ever needed for formats that only report one
     cmd = [
-        'ffprobe', 
-        '-v', 'error', 
-        '-show_entries', 'format=duration', 
-        '-of', 'default=noprint_wrappers=1:nokey=1', 
+        'ffprobe',
+        '-v', 'error',
+        '-show_entries', 'format=duration:stream=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
         str(file_path)
     ]
     try:
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, text=True)
-        return float(result.stdout.strip())
+        # Raw bytes are enough here — float() accepts them directly, so
+        # there is no point decoding stdout or capturing stderr for
+        # every probe in the pool
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+        for value in result.stdout.split():
+            try:
+                duration = float(value)
+            except ValueError:
+                continue
+            if cache_key:
+                cache[cache_key] = duration
+                _duration_cache_dirty = True
+            return duration
+        raise ValueError(f"no duration in ffprobe output: {result.stdout!r}")
     except Exception as e:
         print(f"Error getting duration for {file_path}: {e}")
         return 0
 
+def get_audio_codec(file_path):
+    """Get the codec name of the first audio stream using ffprobe."""
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'a:0',
+        '-show_entries', 'stream=codec_name',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        str(file_path)
+    ]
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, text=True)
+        return result.stdout.strip()
+    except Exception:
+        return None
+
+
+# Detected once per run; the Fraunhofer encoder is several times faster
+# than ffmpeg's native aac at equivalent bitrate but only present in
+# non-free ffmpeg builds
+_aac_encoder = None
+
+def get_aac_encoder():
+    """Return 'libfdk_aac' when the ffmpeg build offers it, else 'aac'."""
+    global _aac_encoder
+    if _aac_encoder is None:
+        _aac_encoder = 'aac'
+        try:
+            result = subprocess.run(
+                ['ffmpeg', '-hide_banner', '-encoders'],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True, text=True
+            )
+            if 'libfdk_aac' in result.stdout:
+                _aac_encoder = 'libfdk_aac'
+        except Exception:
+            pass
+    return _aac_encoder
+
+
+def encode_chapter(input_file, output_file, bitrate, encoder='aac'):
+    """Encode one chapter to an intermediate AAC .m4a file."""
+    cmd = [
+        'ffmpeg', '-nostdin', '-v', 'error',
+        '-i', str(input_file),
+        '-c:a', encoder,
+        '-b:a', bitrate,
+        '-y', str(output_file)
+    ]
+    return subprocess.run(cmd).returncode == 0
+
+
+# Characters the concat demuxer needs escaped inside a quoted entry
+_NEEDS_ESCAPE = re.compile(r"[\\']")
+
+# Leading ordering numbers (e.g. "01_Chapter" -> "Chapter"), compiled
+# once since clean_title runs per chapter
+_LEAD_INDEX_RE = re.compile(r'^\d+[\s_-]+')
+
+# Underscores/dashes to spaces in one table-driven pass
+_SEPARATORS_TT = str.maketrans('_-', '  ')
+
 def clean_title(filename):
     """Convert filename to clean title."""
-    # Remove extension
-    name = Path(filename).stem
-    
-    # Remove ordering numbers (e.g., "01_Chapter" -> "Chapter")
-    # But only if it looks like an index (starts with digits followed by separator)
-    name = re.sub(r'^\d+[\s_-]+', '', name)
-    
-    # Replace underscores/dashes with spaces
-    name = name.replace('_', ' ').replace('-', ' ')
-    
-    # Capitalize words
-    return name.title()
+    # Strip the extension and any leading index, turn separators into
+    # spaces, capitalize words
+    name = _LEAD_INDEX_RE.sub('', Path(filename).stem)
+    return name.translate(_SEPARATORS_TT).title()
 
 def generate_ffmpeg_metadata(chapters, title, author):
     """Generate FFMETADATA1 content."""
+    year = datetime.now().year
     content = [";FFMETADATA1"]
     if title:
         content.append(f"title={title}")
@@ -67,20 +184,23 @@ def generate_ffmpeg_metadata(chapters, title, author):
     
     content.append(f"album={title or 'Audiobook'}")
     content.append("genre=Audiobook")
-    content.append(f"date={datetime.now().year}")
+    content.append(f"date={year}")
     content.append("")
 
+    # One formatted block per chapter instead of six list appends and
+    # f-strings each; timestamps are in milliseconds (TIMEBASE=1/1000)
+    chapter_template = "[CHAPTER]\nTIMEBASE=1/1000\nSTART=%d\nEND=%d\ntitle=%s\n"
     for chapter in chapters:
-        content.append("[CHAPTER]")
-        content.append("TIMEBASE=1/1000") # Milliseconds
-        content.append(f"START={int(chapter['start'] * 1000)}")
-        content.append(f"END={int(chapter['end'] * 1000)}")
-        content.append(f"title={chapter['title']}")
-        content.append("")
-        
+        content.append(chapter_template % (
+            int(chapter['start'] * 1000),
+            int(chapter['end'] * 1000),
+            chapter['title']
+        ))
+
     return "\n".join(content)
 
-def create_m4b(input_files, output_file, title=None, author=None, cover_image=None, bitrate='64k'):
+def create_m4b(input_files, output_file, title=None, author=None, cover_image=None, bitrate='64k',
+               force_reencode=False, jobs=None, trust_durations=False):
     """Create M4B file from input files."""
     
     if not input_files:
@@ -89,28 +209,79 @@ def create_m4b(input_files, output_file, title=None, author=None, cover_image=No
 
     print(f"Processing {len(input_files)} files...")
     
-    # 1. Analyze files and build chapters
+    # 1. Analyze files and build chapters. The concat list and metadata
+    # go through tempfile so concurrent invocations don't trample each
+    # other's files in the working directory
     chapters = []
     current_time = 0.0
-    concat_list_path = Path("concat_list.txt")
-    
-    # Create concat list file
-    with open(concat_list_path, 'w', encoding='utf-8') as f:
-        for file_path in input_files:
-            # Escape single quotes for ffmpeg concat demuxer
-            safe_path = str(file_path).replace("'", "'\\''")
+    concat_file = tempfile.NamedTemporaryFile(
+        'w', encoding='utf-8', prefix='m4b_concat_', suffix='.txt', delete=False
+    )
+    concat_list_path = Path(concat_file.name)
+
+    # Probe all durations up front; each probe is an independent ffprobe
+    # process, so running them serially makes the analysis phase an O(N)
+    # chain of process startups. executor.map keeps input order.
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        durations = list(executor.map(get_audio_duration, input_files))
+        codecs = list(executor.map(get_audio_codec, input_files))
+
+    # When a re-encode is needed, encode the chapters in parallel first:
+    # a single ffmpeg AAC encoder does not scale across cores, but N
+    # independent chapter encodes do. The final pass then only
+    # stream-copies the intermediates while muxing chapters and metadata.
+    if jobs is None:
+        jobs = os.cpu_count()
+    encode_needed = force_reencode or any(codec != 'aac' for codec in codecs)
+    encode_dir = Path(".m4b_chapters")
+    concat_sources = input_files
+    parallel_encoded = False
+
+    if encode_needed and jobs > 1 and len(input_files) > 1:
+        print(f"Encoding {len(input_files)} chapters with up to {jobs} parallel jobs...")
+        encode_dir.mkdir(exist_ok=True)
+        intermediates = [
+            encode_dir / f"{idx:04d}.m4a" for idx in range(len(input_files))
+        ]
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(
+                encode_chapter, input_files, intermediates,
+                repeat(bitrate), repeat(get_aac_encoder())
+            ))
+        if all(results):
+            concat_sources = intermediates
+            parallel_encoded = True
+        else:
+            print("Warning: parallel chapter encode failed, falling back to single-pass encode")
+
+    # Create concat list file; cumulative chapter times stay sequential.
+    # Chapter titles and durations come from the original files even when
+    # the concat entries point at re-encoded intermediates.
+    with concat_file as f:
+        for file_path, source, duration in zip(input_files, concat_sources, durations):
+            # Absolute paths: the demuxer resolves entries relative to
+            # the list file, which now lives in the temp directory.
+            # ffmpeg's own escaping is a backslash before \ and ' (the
+            # old shell-style '\'' pattern breaks on backslashes);
+            # typical audiobook filenames need no escaping at all
+            safe_path = str(Path(source).resolve())
+            if _NEEDS_ESCAPE.search(safe_path):
+                safe_path = safe_path.replace('\\', '\\\\').replace("'", "\\'")
             f.write(f"file '{safe_path}'\n")
-            
-            duration = get_audio_duration(file_path)
-            
+
+            # With --trust-durations the demuxer takes our probed length
+            # instead of parsing each file's headers again at mux time
+            if trust_durations and duration > 0:
+                f.write(f"duration {duration:.6f}\n")
+
             chapter_title = clean_title(file_path.name)
-            
+
             chapters.append({
                 'title': chapter_title,
                 'start': current_time,
                 'end': current_time + duration
             })
-            
+
             print(f"  - {file_path.name} ({duration:.1f}s) -> {chapter_title}")
             current_time += duration
 
@@ -118,37 +289,64 @@ def create_m4b(input_files, output_file, title=None, author=None, cover_image=No
     print(f"\nTotal duration: {total_duration/60:.2f} minutes")
 
     # 2. Create metadata file
-    metadata_path = Path("metadata.txt")
     metadata_content = generate_ffmpeg_metadata(chapters, title, author)
-    with open(metadata_path, 'w', encoding='utf-8') as f:
+    with tempfile.NamedTemporaryFile(
+        'w', encoding='utf-8', prefix='m4b_meta_', suffix='.txt', delete=False
+    ) as f:
+        metadata_path = Path(f.name)
         f.write(metadata_content)
 
     # 3. Build ffmpeg command
     # Basic command: concat audio, map metadata, convert to AAC
-    cmd = [
-        'ffmpeg',
+    cmd = ['ffmpeg']
+
+    # Let ffmpeg spread demux/mux/filter work across cores; skipped when
+    # the chapters were encoded in parallel, since those jobs already
+    # saturate the CPU and the remaining mux is I/O-bound
+    if not parallel_encoded:
+        n = os.cpu_count()
+        cmd.extend([
+            '-threads', '0',
+            '-filter_threads', str(n),
+            '-filter_complex_threads', str(n)
+        ])
+
+    cmd.extend([
         '-f', 'concat',
         '-safe', '0',
         '-i', str(concat_list_path),
         '-i', str(metadata_path)
-    ]
+    ])
 
-    # Add cover image if provided
-    map_audio_index = 0
-    if cover_image and Path(cover_image).exists():
-        cmd.extend(['-i', str(cover_image)])
+    # Add cover image if provided; one Path, one stat
+    cover = Path(cover_image) if cover_image else None
+    if cover and cover.is_file():
+        cmd.extend(['-i', str(cover)])
         cmd.extend(['-map', '0:a', '-map', '2:v'])
         cmd.extend(['-c:v', 'copy', '-disposition:v', 'attached_pic'])
-        print(f"Adding cover image: {cover_image}")
+        print(f"Adding cover image: {cover}")
     else:
         cmd.extend(['-map', '0:a'])
     
     cmd.extend(['-map_metadata', '1'])
     
     # Encoding settings
-    # AAC codec, .m4b extension (usually requires aac codec)
-    cmd.extend(['-c:a', 'aac', '-b:a', bitrate])
+    # AAC codec, .m4b extension (usually requires aac codec). Inputs
+    # that are already AAC — originals or the parallel-encoded
+    # intermediates — are stream-copied: the mux then runs at disk
+    # speed instead of re-encoding every chapter.
+    if parallel_encoded:
+        cmd.extend(['-c:a', 'copy'])
+    elif not force_reencode and all(codec == 'aac' for codec in codecs):
+        print("All inputs are already AAC — stream copying without re-encoding")
+        cmd.extend(['-c:a', 'copy'])
+    else:
+        cmd.extend(['-c:a', get_aac_encoder(), '-b:a', bitrate])
     
+    # Move the moov atom to the front so players can start playback
+    # before the whole file has downloaded
+    cmd.extend(['-movflags', '+faststart'])
+
     # Overwrite output
     cmd.extend(['-y', str(output_file)])
 
@@ -166,21 +364,22 @@ def create_m4b(input_files, output_file, title=None, author=None, cover_image=No
             os.remove(concat_list_path)
         if metadata_path.exists():
             os.remove(metadata_path)
+        if encode_dir.exists():
+            shutil.rmtree(encode_dir, ignore_errors=True)
 
     return success
 
 def get_files_from_pattern(pattern):
     """Get list of files matching a glob pattern."""
-    from glob import glob
-    
-    # Try the pattern as-is first
-    files = sorted(glob(pattern))
-    
-    # If no files found and pattern doesn't include a path, try current directory
-    if not files and '/' not in pattern and '\\' not in pattern:
-        files = sorted(glob(f"./{pattern}"))
-    
-    return [Path(f) for f in files]
+    # Path.glob yields Path objects directly, so no string->Path
+    # conversion pass over the matches. Absolute patterns are split into
+    # an anchor and a relative part since Path.glob wants relative ones.
+    root = Path('.')
+    if os.path.isabs(pattern):
+        root = Path(os.path.splitdrive(pattern)[0] + os.sep)
+        pattern = os.path.relpath(pattern, root)
+
+    return sorted(root.glob(pattern))
 
 def sort_files_by_prefix(files):
     """Sort files based on numeric prefix in filename."""
@@ -206,6 +405,9 @@ Examples:
 
   # With metadata
   python 6_create_m4b.py -i audio/*.mp3 -o book.m4b --title "My Book" --author "John Doe" --cover cover.jpg
+
+Encoding uses libfdk_aac automatically when your ffmpeg build includes it
+(non-free builds only); otherwise the native aac encoder is used.
         '''
     )
     
@@ -215,6 +417,12 @@ Examples:
     parser.add_argument('--author', help='Audiobook author')
     parser.add_argument('--cover', help='Cover image file (jpg/png)')
     parser.add_argument('--bitrate', default='64k', help='Audio bitrate (default: 64k)')
+    parser.add_argument('--force-reencode', action='store_true',
+                        help='Re-encode even when all inputs are already AAC')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+                        help='Parallel chapter encodes when re-encoding (default: CPU count, 1 disables)')
+    parser.add_argument('--trust-durations', action='store_true',
+                        help='Write probed durations into the concat list so ffmpeg skips its own per-file probe')
     
     args = parser.parse_args()
     
@@ -230,17 +438,31 @@ Examples:
             else:
                 p = Path(item)
                 if p.is_dir():
-                    # If directory, get all audio files
-                    for ext in ['*.mp3', '*.m4a', '*.wav', '*.aac']:
-                        input_files.extend(sorted(p.glob(ext)))
+                    # If directory, get all audio files in one scan
+                    # instead of one glob pass per extension
+                    with os.scandir(p) as it:
+                        input_files.extend(sorted(
+                            Path(entry.path) for entry in it
+                            if entry.is_file()
+                            and entry.name.lower().endswith(('.mp3', '.m4a', '.wav', '.aac'))
+                        ))
                 else:
                     if p.exists():
                         input_files.append(p)
                     else:
                         print(f"Warning: File not found: {item}")
 
-    # Remove duplicates and sort by numeric prefix
-    input_files = sort_files_by_prefix(list(dict.fromkeys(input_files)))
+    # Remove duplicates by resolved path — ./foo.mp3, foo.mp3 and the
+    # absolute form are the same file and should only be probed and
+    # muxed once — then sort by numeric prefix
+    seen = set()
+    unique_files = []
+    for p in input_files:
+        resolved = p.resolve()
+        if resolved not in seen:
+            seen.add(resolved)
+            unique_files.append(resolved)
+    input_files = sort_files_by_prefix(unique_files)
     
     if not input_files:
         print("Error: No input files found.")
@@ -252,7 +474,10 @@ Examples:
         title=args.title, 
         author=args.author, 
         cover_image=args.cover,
-        bitrate=args.bitrate
+        bitrate=args.bitrate,
+        force_reencode=args.force_reencode,
+        jobs=args.jobs,
+        trust_durations=args.trust_durations
     )
 
 if __name__ == '__main__':
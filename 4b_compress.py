@@ -6,53 +6,69 @@ Supported formats: MP3, AAC (m4a)
 
 import argparse
 import os
+import shutil
+import subprocess
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 import time
 
 def check_dependencies():
-    """Check if pydub and ffmpeg are available."""
-    try:
-        from pydub import AudioSegment
+    """Check if ffmpeg is available."""
+    if shutil.which('ffmpeg'):
         return True
-    except ImportError:
-        print("Error: pydub not installed")
-        print("Install with: pip install pydub")
-        print("\nAlso ensure ffmpeg is installed:")
-        print("  macOS: brew install ffmpeg")
-        print("  Ubuntu: sudo apt-get install ffmpeg")
-        return False
+    print("Error: ffmpeg not found.")
+    print("Please install ffmpeg:")
+    print("  macOS: brew install ffmpeg")
+    print("  Ubuntu: sudo apt-get install ffmpeg")
+    return False
 
 def get_supported_extensions():
     """Return list of supported audio extensions."""
     return ['.mp3', '.wav', '.m4a', '.flac', '.ogg', '.aac']
 
+# Precomputed for the directory scan; set lookup per entry instead of
+# rebuilding the list
+_EXTS = frozenset(get_supported_extensions())
+
 def compress_audio(input_path, output_path, format_name, bitrate):
-    """Compress a single audio file."""
-    from pydub import AudioSegment
-    
+    """Compress a single audio file by invoking ffmpeg directly.
+
+    Going through pydub decodes the whole file to PCM in Python memory
+    and dumps it to a temp file before re-encoding; one ffmpeg process
+    transcodes in a single streaming pass instead.
+    """
     print(f"Processing: {input_path.name}")
-    
+
+    codec = 'libmp3lame' if format_name == 'mp3' else 'aac'
+
     try:
-        # Load audio file
-        # pydub attempts to auto-detect format, but we can be explicit if needed
-        audio = AudioSegment.from_file(str(input_path))
-        
         # Ensure output directory exists
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Prepare export parameters
-        export_params = {
-            "format": format_name,
-            "bitrate": bitrate
-        }
-        
+
+        cmd = [
+            'ffmpeg', '-nostdin', '-v', 'error',
+            '-i', str(input_path),
+            '-c:a', codec,
+            '-b:a', bitrate,
+            '-threads', '0'
+        ]
+        if format_name == 'mp3':
+            # LAME speed/quality knob; 2 is near-transparent at these
+            # bitrates and noticeably faster than the default
+            cmd.extend(['-compression_level', '2'])
+        else:
+            # Move the moov atom up front so players can start streaming
+            # the m4a before the whole file downloads
+            cmd.extend(['-movflags', '+faststart'])
+        cmd.extend(['-y', str(output_path)])
+
         # Start compression
         start_time = time.time()
-        
-        # Export
-        audio.export(str(output_path), **export_params)
-        
+
+        subprocess.run(cmd, check=True)
+
         duration = time.time() - start_time
         
         # Calculate size reduction
@@ -148,11 +164,14 @@ def main():
     files_processed = 0
     errors = 0
     
-    # Walk through input directory
-    files_to_process = [
-        f for f in input_path.iterdir() 
-        if f.is_file() and f.suffix.lower() in supported_exts
-    ]
+    # Walk through input directory; scandir's DirEntry carries the file
+    # type from the directory read, so no extra stat per entry
+    with os.scandir(input_path) as it:
+        files_to_process = [
+            Path(entry.path) for entry in it
+            if entry.is_file() and os.path.splitext(entry.name)[1].lower() in _EXTS
+        ]
+    files_to_process.sort()
     
     if not files_to_process:
         print(f"No supported audio files found in {args.input_folder}")
@@ -160,22 +179,29 @@ def main():
         sys.exit(0)
         
     print(f"Found {len(files_to_process)} files to process.")
-    
-    for file_path in files_to_process:
-        target_file = output_path / (file_path.stem + output_ext)
-        
-        success = compress_audio(
-            file_path, 
-            target_file, 
-            export_format, 
-            args.bitrate
+
+    # Each file's transcode is an independent, CPU-bound ffmpeg run, so
+    # spread them across all cores with a process pool
+    target_files = [
+        output_path / (file_path.stem + output_ext)
+        for file_path in files_to_process
+    ]
+
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        results = executor.map(
+            compress_audio,
+            files_to_process,
+            target_files,
+            repeat(export_format),
+            repeat(args.bitrate)
         )
-        
-        if success:
-            files_processed += 1
-        else:
-            errors += 1
-            
+
+        for success in results:
+            if success:
+                files_processed += 1
+            else:
+                errors += 1
+
     print("-" * 50)
     print(f"Completed! Processed: {files_processed}, Errors: {errors}")
 
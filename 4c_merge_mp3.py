@@ -5,12 +5,117 @@ Script to merge multiple MP3 files into a single file.
 
 import argparse
 import os
+import shutil
+import subprocess
 import sys
 from pathlib import Path
 
 
+def probe_audio_params(audio_file):
+    """Get (codec, sample_rate, channels) of an audio file using ffprobe."""
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'a:0',
+        '-show_entries', 'stream=codec_name,sample_rate,channels',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        str(audio_file)
+    ]
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, text=True)
+        codec, sample_rate, channels = result.stdout.split()
+        return codec, int(sample_rate), int(channels)
+    except Exception:
+        return None
+
+
+def merge_audio_files_ffmpeg(input_files, output_file, silence_duration):
+    """Merge MP3 files by stitching their frames with ffmpeg's concat demuxer.
+
+    With -c copy no audio is decoded or re-encoded, so the merge runs at
+    disk speed, uses constant memory and is lossless. Only used when all
+    inputs share codec, sample rate and channel count; mixed inputs fall
+    back to the pydub path.
+    """
+    if not (shutil.which('ffmpeg') and shutil.which('ffprobe')):
+        return False
+
+    params = [probe_audio_params(f) for f in input_files]
+    if None in params or len(set(params)) != 1:
+        print("Inputs have mixed formats, falling back to decode/re-encode merge")
+        return False
+
+    codec, sample_rate, channels = params[0]
+    output_dir = Path(output_file).resolve().parent
+    silence_file = output_dir / '.silence_spacer.mp3'
+    list_file = output_dir / '.concat_list.txt'
+
+    try:
+        have_silence = False
+        if silence_duration > 0:
+            layout = 'mono' if channels == 1 else 'stereo'
+            silence_cmd = [
+                'ffmpeg', '-v', 'error',
+                '-f', 'lavfi',
+                '-i', f'anullsrc=r={sample_rate}:cl={layout}',
+                '-t', str(silence_duration / 1000),
+                '-c:a', 'libmp3lame',
+                '-y', str(silence_file)
+            ]
+            have_silence = subprocess.run(silence_cmd).returncode == 0
+
+        with open(list_file, 'w', encoding='utf-8') as f:
+            for idx, audio_file in enumerate(input_files):
+                if idx > 0 and have_silence:
+                    f.write(f"file '{silence_file}'\n")
+                safe_path = str(Path(audio_file).resolve()).replace("'", "'\\''")
+                f.write(f"file '{safe_path}'\n")
+
+        cmd = [
+            'ffmpeg', '-v', 'error',
+            '-f', 'concat',
+            '-safe', '0',
+            '-i', str(list_file),
+            '-c', 'copy',
+            '-y', str(output_file)
+        ]
+        return subprocess.run(cmd).returncode == 0
+    except Exception as e:
+        print(f"Warning: ffmpeg merge failed: {e}")
+        return False
+    finally:
+        for temp_file in (list_file, silence_file):
+            try:
+                os.remove(temp_file)
+            except OSError:
+                pass
+
+
 def merge_audio_files(input_files, output_file, silence_duration=500):
-    """Merge multiple audio files into one using pydub."""
+    """Merge multiple audio files into one."""
+    print(f"Merging {len(input_files)} audio files...")
+
+    # Verify all input files exist
+    for file in input_files:
+        if not Path(file).exists():
+            print(f"Error: File not found: {file}")
+            sys.exit(1)
+
+    # A single input needs no decoding at all — just copy it into place
+    if len(input_files) == 1:
+        shutil.copyfile(input_files[0], output_file)
+        file_size_mb = os.path.getsize(output_file) / (1024 * 1024)
+        print(f"  File size: {file_size_mb:.2f} MB")
+        print(f"\n✓ Merged audio saved to: {output_file}")
+        return
+
+    # Prefer the lossless stream-copy merge when the inputs allow it
+    if merge_audio_files_ffmpeg(input_files, output_file, silence_duration):
+        file_size_mb = os.path.getsize(output_file) / (1024 * 1024)
+        print(f"  File size: {file_size_mb:.2f} MB")
+        print(f"\n✓ Merged audio saved to: {output_file}")
+        return
+
     try:
         from pydub import AudioSegment
     except ImportError:
@@ -20,42 +125,83 @@ def merge_audio_files(input_files, output_file, silence_duration=500):
         print("  macOS: brew install ffmpeg")
         print("  Ubuntu: sudo apt-get install ffmpeg")
         sys.exit(1)
-    
-    print(f"Merging {len(input_files)} audio files...")
-    
-    # Verify all input files exist
-    for file in input_files:
-        if not Path(file).exists():
-            print(f"Error: File not found: {file}")
-            sys.exit(1)
-    
-    combined = AudioSegment.empty()
-    
-    for idx, audio_file in enumerate(input_files, 1):
-        print(f"  [{idx}/{len(input_files)}] Adding: {audio_file}")
-        try:
-            audio = AudioSegment.from_mp3(audio_file)
-            combined += audio
-            
-            # Add silence between files (except after the last one)
-            if idx < len(input_files) and silence_duration > 0:
-                combined += AudioSegment.silent(duration=silence_duration)
-                print(f"      Added {silence_duration}ms silence")
-                
-        except Exception as e:
-            print(f"Error loading {audio_file}: {e}")
+
+    # First file defines the output parameters; 16-bit samples so the
+    # PCM can feed an s16le pipe
+    try:
+        first = AudioSegment.from_mp3(input_files[0])
+    except Exception as e:
+        print(f"Error loading {input_files[0]}: {e}")
+        sys.exit(1)
+    frame_rate = first.frame_rate
+    channels = first.channels
+    sample_width = 2
+    if first.sample_width != sample_width:
+        first = first.set_sample_width(sample_width)
+
+    # The silence spacer is zeroed frames rendered once
+    silence_raw = b''
+    if silence_duration > 0:
+        silence_frames = int(frame_rate * silence_duration / 1000)
+        silence_raw = b'\x00' * (silence_frames * sample_width * channels)
+
+    def pcm_stream():
+        """Decode one input at a time and yield its raw PCM."""
+        yield first.raw_data
+        for idx, audio_file in enumerate(input_files[1:], 2):
+            print(f"  [{idx}/{len(input_files)}] Adding: {audio_file}")
+            if silence_raw:
+                yield silence_raw
+            try:
+                audio = AudioSegment.from_mp3(audio_file)
+            except Exception as e:
+                print(f"Error loading {audio_file}: {e}")
+                sys.exit(1)
+            if (audio.frame_rate, audio.sample_width, audio.channels) != (frame_rate, sample_width, channels):
+                audio = audio.set_frame_rate(frame_rate).set_sample_width(sample_width).set_channels(channels)
+            yield audio.raw_data
+
+    print(f"  [1/{len(input_files)}] Adding: {input_files[0]}")
+
+    if shutil.which('ffmpeg'):
+        # Pipe the PCM straight into an ffmpeg encoder so only one
+        # decoded file is in memory at a time; accumulating the whole
+        # book first costs O(total duration) RAM
+        cmd = [
+            'ffmpeg', '-v', 'error',
+            '-f', 's16le',
+            '-ar', str(frame_rate),
+            '-ac', str(channels),
+            '-i', 'pipe:0',
+            '-c:a', 'libmp3lame',
+            '-b:a', '192k',
+            '-y', str(output_file)
+        ]
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+        total_bytes = 0
+        for part in pcm_stream():
+            proc.stdin.write(part)
+            total_bytes += len(part)
+        proc.stdin.close()
+        if proc.wait() != 0:
+            print("Error: ffmpeg encoding failed")
             sys.exit(1)
-    
-    # Get total duration
-    duration_seconds = len(combined) / 1000
+        duration_seconds = total_bytes / (frame_rate * sample_width * channels)
+    else:
+        # Last resort without ffmpeg: build the combined segment in memory
+        combined = AudioSegment(
+            data=b''.join(pcm_stream()),
+            sample_width=sample_width,
+            frame_rate=frame_rate,
+            channels=channels
+        )
+        duration_seconds = len(combined) / 1000
+        combined.export(output_file, format="mp3")
+
     duration_minutes = duration_seconds / 60
-    
     print(f"\nExporting merged audio...")
     print(f"  Total duration: {duration_minutes:.2f} minutes ({duration_seconds:.1f} seconds)")
-    
-    # Export the merged audio
-    combined.export(output_file, format="mp3")
-    
+
     # Get file size
     file_size_mb = os.path.getsize(output_file) / (1024 * 1024)
     print(f"  File size: {file_size_mb:.2f} MB")
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Run the whole vault -> book -> audio pipeline in one process.
+
+Notes stream from the scanner straight through the AI and TTS stages, so
+the vault is walked and each note read exactly once — no intermediate CSV
+or markdown files are written between stages (the book text can still be
+saved with --book_file). The numbered scripts remain usable on their own;
+this reuses their functions.
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+
+def _load_script(module_name, filename):
+    """Import one of the numbered pipeline scripts as a module."""
+    spec = importlib.util.spec_from_file_location(
+        module_name, Path(__file__).parent / filename
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+create_csv = _load_script('create_csv', '1_create_csv.py')
+write_book = _load_script('write_book_using_ai', '2_write_book_using_ai.py')
+md_to_audio = _load_script('md_to_audio', '3_md_to_audio.py')
+
+
+def scan_notes(source_folder, column=None, value=None, input_file=None):
+    """Yield (file_name, path) for every note that should be processed.
+
+    Streams straight from the directory walk; when a redacted CSV filter
+    is given, only notes whose relative path matches a filtered row are
+    considered. Only paths are yielded — the worker reads the note, so
+    queued work never holds the vault's text in memory.
+    """
+    allowed = None
+    if input_file:
+        filtered = write_book.read_csv_and_filter(input_file, column, value)
+        allowed = {row.relative_path for row in filtered}
+
+    for path in create_csv._walk_md(source_folder):
+        relative_path = os.path.relpath(path, source_folder)
+        if allowed is not None and relative_path not in allowed:
+            continue
+
+        yield os.path.basename(path), path
+
+
+def process_note(file_name, path, config):
+    """Read one note, transform it with the AI and synthesize it to audio."""
+    api_key = config['openrouter_api_key']
+    model = config['model']
+    prompt = config['prompt']
+
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    if len(content.strip()) < config['min_chars']:
+        return f"{file_name} | Skipping, below {config['min_chars']} chars"
+
+    ai_text = write_book.get_cached_response(model, prompt, content)
+    if ai_text is None:
+        config['limiter'].acquire(
+            tokens=write_book.estimate_tokens(prompt + content)
+        )
+        ai_text = write_book.call_openrouter_api(content, api_key, model, prompt)
+        write_book.store_cached_response(model, prompt, content, ai_text)
+
+    if not ai_text.strip():
+        return f"{file_name} | AI returned nothing, skipping"
+
+    if config['book_out'] is not None:
+        write_book.append_to_output_file(
+            config['book_out'], config['book_index'], file_name, ai_text
+        )
+
+    # Synthesize straight from the in-memory text — the markdown never
+    # has to round-trip through disk between the stages. The output name
+    # comes from the note's path relative to the vault, not just its
+    # basename: vaults repeat names like index.md across folders, and
+    # two workers writing the same chunk files would corrupt both notes.
+    output_dir = config['output_dir']
+    extension = config['file_extension']
+    relative_path = os.path.relpath(path, config['source_folder'])
+    stem = str(Path(relative_path).with_suffix('')).replace(os.sep, '_')
+    safe_title = md_to_audio.safe_filename_from_title(stem) or 'note'
+    output_file = output_dir / f"{safe_title}.{extension}"
+
+    if output_file.exists():
+        return f"{file_name} | Audio already exists, skipping"
+
+    chunks = md_to_audio.split_text_into_chunks(
+        md_to_audio.clean_text_for_speech(ai_text),
+        max_chars=config['max_chunk_size'],
+        measure=config['chunk_measure']
+    )
+
+    audio_files = []
+    for idx, chunk in enumerate(chunks):
+        if len(chunks) > 1:
+            chunk_output = output_dir / f"{safe_title}_chunk_{idx}.{extension}"
+        else:
+            chunk_output = output_file
+        if not config['synthesize'](chunk, chunk_output):
+            return f"{file_name} ✗ TTS failed on chunk {idx + 1}/{len(chunks)}"
+        audio_files.append(str(chunk_output))
+
+    if len(audio_files) > 1:
+        md_to_audio.merge_audio_files(audio_files, str(output_file))
+
+    return f"{file_name} | done ({len(ai_text)} chars, {len(chunks)} chunks) -> {output_file.name} ✓"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Stream notes from an Obsidian vault through AI and TTS in one pass.'
+    )
+    parser.add_argument('--source_folder', required=True, help='Obsidian vault folder')
+    parser.add_argument('--output_folder', required=True, help='Output folder for audio files')
+    parser.add_argument('--prompt', required=True, help='Prompt to use for AI transformation')
+    parser.add_argument('--input_file', help='Optional redacted CSV to filter notes')
+    parser.add_argument('--column', help='Column name to filter notes (with --input_file)')
+    parser.add_argument('--value', help='Value in that column to filter notes (with --input_file)')
+    parser.add_argument('--book_file', help='Also append the AI book text to this markdown file')
+    parser.add_argument('--provider', choices=['elevenlabs', 'openai', 'google'], default='openai')
+    parser.add_argument('--voice', help='Voice to use for the TTS provider')
+    parser.add_argument('--language', help='Language code for Google TTS')
+    parser.add_argument('--model', help='Model for OpenAI TTS (defaults to "tts-1")')
+    parser.add_argument('--workers', type=int, default=4, help='Notes processed concurrently (default: 4)')
+    parser.add_argument('--rpm', type=int, default=60, help='AI requests per minute budget (default: 60)')
+    parser.add_argument('--min_chars', type=int, default=1, help='Skip notes shorter than this (default: 1)')
+
+    args = parser.parse_args()
+
+    if args.input_file and not (args.column and args.value):
+        print("Error: --column and --value are required with --input_file")
+        sys.exit(1)
+
+    openrouter_api_key = os.getenv('OPENROUTER_API_KEY')
+    model = os.getenv('OPENROUTER_MODEL')
+    if not openrouter_api_key or not model:
+        print("Error: OPENROUTER_API_KEY and OPENROUTER_MODEL must be set")
+        sys.exit(1)
+
+    # TTS provider configuration mirrors 3_md_to_audio.py
+    file_extension = 'wav' if args.provider == 'google' else 'mp3'
+    chunk_measure = len
+    if args.provider == 'elevenlabs':
+        tts_api_key = os.getenv('ELEVENLABS_API_KEY')
+        voice = args.voice
+        max_chunk_size = 5000
+        if not tts_api_key or not voice:
+            print("Error: ELEVENLABS_API_KEY and --voice are required for ElevenLabs")
+            sys.exit(1)
+
+        def synthesize(chunk, chunk_output):
+            return md_to_audio.text_to_speech_elevenlabs(chunk, tts_api_key, voice, chunk_output)
+    elif args.provider == 'google':
+        voice = args.voice or os.getenv('GOOGLE_VOICE', 'pl-PL-Chirp3-HD-Iapetus')
+        language = args.language or os.getenv('GOOGLE_LANGUAGE', 'pl-PL')
+        # Google's limit is 5000 bytes; measure in UTF-8 bytes like
+        # 3_md_to_audio.py so each request uses nearly the whole budget
+        max_chunk_size = 4900
+        chunk_measure = md_to_audio._utf8_len
+
+        def synthesize(chunk, chunk_output):
+            return md_to_audio.text_to_speech_google(chunk, voice, language, chunk_output)
+    else:  # openai
+        tts_api_key = os.getenv('OPENAI_API_KEY')
+        voice = args.voice or 'nova'
+        tts_model = args.model or 'tts-1'
+        max_chunk_size = 4096
+        if not tts_api_key:
+            print("Error: OPENAI_API_KEY not found in environment variables")
+            sys.exit(1)
+
+        def synthesize(chunk, chunk_output):
+            return md_to_audio.text_to_speech_openai(chunk, tts_api_key, voice, tts_model, chunk_output)
+
+    output_dir = Path(args.output_folder)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    config = {
+        'source_folder': args.source_folder,
+        'openrouter_api_key': openrouter_api_key,
+        'model': model,
+        'prompt': args.prompt,
+        'limiter': write_book.RateLimiter(args.rpm),
+        'synthesize': synthesize,
+        'output_dir': output_dir,
+        'file_extension': file_extension,
+        'max_chunk_size': max_chunk_size,
+        'chunk_measure': chunk_measure,
+        'min_chars': args.min_chars,
+        'book_out': None,
+        'book_index': None,
+    }
+
+    print(f"Using model: {model}, provider: {args.provider}")
+    print(f"Streaming notes from {args.source_folder} with {args.workers} workers")
+
+    notes = scan_notes(
+        args.source_folder,
+        column=args.column,
+        value=args.value,
+        input_file=args.input_file,
+    )
+
+    book_out = book_index = None
+    try:
+        if args.book_file:
+            book_out = open(args.book_file, 'a', encoding='utf-8', buffering=1 << 16)
+            book_index = open(write_book.get_index_file(args.book_file), 'a', encoding='utf-8')
+            config['book_out'] = book_out
+            config['book_index'] = book_index
+
+        done = 0
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            futures = {
+                executor.submit(process_note, file_name, path, config): file_name
+                for file_name, path in notes
+            }
+
+            for future in as_completed(futures):
+                file_name = futures[future]
+                done += 1
+                t_done = datetime.now().strftime("%H:%M:%S")
+                prefix = f"[{t_done}] [{done}/{len(futures)}]"
+                try:
+                    print(f"{prefix} {future.result()}")
+                except Exception as e:
+                    print(f"{prefix} ✗ Error processing {file_name}: {e}")
+    finally:
+        if book_out is not None:
+            book_out.close()
+        if book_index is not None:
+            book_index.close()
+
+    print(f"\n✓ Pipeline complete! Audio saved to: {args.output_folder}")
+
+
+if __name__ == '__main__':
+    main()